@@ -1,40 +1,67 @@
 import streamlit as st
 import pandas as pd
-from barrierReferralData import BarrierReferralData
-import plotly.express as px
-from uszipcode import SearchEngine
-search = SearchEngine()
+from barrierReferralData import BarrierReferralData, get_data
+from figures import build_ethnicity_fig, build_sex_fig, build_age_fig, build_solution_fig, build_city_fig
 
-BARRIERS = BarrierReferralData()
+BARRIERS = get_data()
 
-def zco(x: str) -> str:
+@st.cache_resource
+def get_search_engine():
     """
-    Get the city name from the zip code.
+    Returns the uszipcode SearchEngine, created once per process and shared across
+    reruns and sessions. Treat it as read-only. uszipcode is imported here so the
+    import only happens the first time the engine is needed.
 
     Args:
-        x (int): Zip code.
+        None
+    Returns:
+        SearchEngine: uszipcode search engine
+    """
+    from uszipcode import SearchEngine
+    return SearchEngine()
+
+def zipcode_cities(zipcodes: list) -> dict:
+    """
+    Get the city names for a list of zip codes with a single query.
+
+    Args:
+        zipcodes (list): Zip codes.
     Returns:
-        str: City name or the zip code if city name is not found.
+        dict: zip code -> city name (or the zip code if the city name is not found).
     """
-    try:
-        city = search.by_zipcode(x).major_city
-        return city 
-    except AttributeError:
-        return x
+    from sqlalchemy import bindparam, text
+
+    keys = {z: str(z).zfill(5) for z in zipcodes}
+    query = text("SELECT zipcode, major_city FROM simple_zipcode WHERE zipcode IN :z").bindparams(
+        bindparam('z', expanding=True))
+    with get_search_engine().engine.connect() as conn:
+        cities = dict(conn.execute(query, {'z': list(set(keys.values()))}).fetchall())
+    return {z: cities.get(key) or z for z, key in keys.items()}
 
-def load_csv_data(df: pd.DataFrame):
+@st.cache_data(ttl="1h", max_entries=4)
+def _csv_bytes(version: int) -> bytes:
+    """
+    Convert the barrier data to CSV bytes (dates as mm-dd-yyyy). Cached so the
+    CSV is only written once per version of the data.
+
+    Args:
+        version (int): BARRIERS.version, changes whenever the data is updated.
+    Returns:
+        bytes: utf-8 encoded CSV data
+    """
+    df = BARRIERS.barriers.assign(date=lambda d: d['date'].dt.strftime('%m-%d-%Y'))
+    return df.to_csv(index=False).encode('utf-8')
+
+def load_csv_data(version: int):
     """
     Generate a download button to download data as a CSV file.
 
     Args:
-        df (pandas.DataFrame): DataFrame to be converted to CSV.
+        version (int): BARRIERS.version, used as the cache key for the CSV bytes.
     Returns:
         None
     """
-    @st.cache_data
-    def convert_df(df):
-       return df.to_csv(index=False).encode('utf-8')
-    csv = convert_df(df)
+    csv = _csv_bytes(version)
     st.sidebar.download_button(
         "Download Barrier Data",
         csv,
@@ -43,6 +70,34 @@ def load_csv_data(df: pd.DataFrame):
         key='download-csv'
     )
 
+@st.cache_data(ttl="1h", max_entries=8)
+def _counts(col: str, version: int) -> pd.Series:
+    """
+    Counts of every value in a ';'-separated multiple choice column, most common
+    first (BarrierReferralData.valueCounts, cached per version of the data).
+    Callers take the top values they need with head().
+
+    Args:
+        col (str): Column name, 'barrier_list' or 'solution_path'.
+        version (int): BARRIERS.version, changes whenever the data is updated.
+    Returns:
+        pd.Series: count of each value in col
+    """
+    return BARRIERS.valueCounts(col)
+
+@st.cache_data(ttl="1h", max_entries=4)
+def _kpis(version: int) -> tuple:
+    """
+    Total and unique number of reported barriers, for the KPI cards.
+
+    Args:
+        version (int): BARRIERS.version, changes whenever the data is updated.
+    Returns:
+        tuple: (total barriers reported, unique barriers identified)
+    """
+    barrier_counts = _counts('barrier_list', version)
+    return int(barrier_counts.sum()), len(barrier_counts)
+
 def display_top_barriers(i: int, barriers: BarrierReferralData, col: str = 'barrier_list'):
     """
     Display the top barriers based on the specified column.
@@ -54,20 +109,27 @@ def display_top_barriers(i: int, barriers: BarrierReferralData, col: str = 'barr
     Returns:
         None
     """
-    top_values = barriers.topValues(col, i)
+    top_values = _counts(col, barriers.version).head(i)
     st.write(f'##### Top {i} Barriers')
     st.write(top_values)
 
-def city_counts():
+@st.cache_data(ttl="1h", max_entries=4)
+def city_counts(version: int) -> pd.DataFrame:
     """
-    Returns the City names and their respective counts.
+    Returns the City names and their respective counts. Cached so the
+    zipcode lookups only run once per version of the data. The zipcodes
+    are counted first, then the counts are summed per city (all unique
+    zipcodes are looked up in one query).
 
     Args:
-        None:
+        version (int): BARRIERS.version, changes whenever the data is updated.
     Returns: 
         city_counts (pd.DataFrame) : dataframe containing unique cities and their counts
     """
-    return BARRIERS.barriers['zipcode'].apply(zco).astype('string').value_counts().reset_index()
+    zip_counts = BARRIERS.barriers['zipcode'].value_counts(sort=False)
+    cities = zip_counts.index.map(zipcode_cities(list(zip_counts.index))).astype('string')
+    city_counts = zip_counts.groupby(cities, sort=False).sum().sort_values(ascending=False)
+    return city_counts.rename_axis('zipcode').reset_index()
 
 def display_city_distribution(i: int, city_counts: pd.DataFrame):
     """
@@ -79,11 +141,7 @@ def display_city_distribution(i: int, city_counts: pd.DataFrame):
     Returns:
         None
     """
-    city_counts_i = city_counts[:i]
-    city_counts_i.columns = ['zipcode', 'count']
-    fig_city = px.bar(city_counts_i, x='zipcode', y='count',
-                    title='City Distribution',
-                    labels={'zipcode': 'City', 'count': 'Count'})
+    fig_city = build_city_fig(city_counts, BARRIERS.version, i)
     st.plotly_chart(fig_city, use_container_width=True)
 
 def display_solution_pathways(i: int):
@@ -95,13 +153,48 @@ def display_solution_pathways(i: int):
     Returns:
         None
     """
-    top_solution_data = BARRIERS.topValues('solution_path', 10)[:i]
-    fig_solution = px.bar(top_solution_data, x=top_solution_data.index, y=top_solution_data.values,
-                        labels={'y': 'Count', 'index': ' '},
-                        title='Top Solution Pathways')
+    fig_solution = build_solution_fig(_counts('solution_path', BARRIERS.version), BARRIERS.version, i)
     st.plotly_chart(fig_solution, use_container_width=True)
 
-CITY_COUNTS = city_counts()
+@st.fragment
+def top_barriers_section():
+    """
+    Fragment with the barrier count input and the top barriers table. Changing
+    the input only reruns this fragment, not the whole app.
+
+    Args:
+        None
+    Returns:
+        None
+    """
+    i = st.number_input("Filter Barrier Count", min_value=1, max_value=len(_counts('barrier_list', BARRIERS.version)), value=5)
+    display_top_barriers(i, BARRIERS)
+
+@st.fragment
+def city_section(city_counts: pd.DataFrame):
+    """
+    Fragment with the city count input and the city distribution chart.
+
+    Args:
+        city_counts (pd.DataFrame): df containing city counts
+    Returns:
+        None
+    """
+    i_city = st.number_input("Filter City Count", min_value=1, max_value=city_counts['zipcode'].count(), value=5)
+    display_city_distribution(i_city, city_counts=city_counts)
+
+@st.fragment
+def solution_section():
+    """
+    Fragment with the solution path input and the solution pathways chart.
+
+    Args:
+        None
+    Returns:
+        None
+    """
+    i_solution_path = st.number_input("Filter Solution Path", min_value=1, max_value=len(_counts('solution_path', BARRIERS.version)), value=5)
+    display_solution_pathways(i_solution_path)
 
 def main():
     """
@@ -112,36 +205,17 @@ def main():
     Returns:
         None
     """
-    # Load and update data
-    BARRIERS.updateData()
-
-    # Get ethnicity Distribution and create figure
-    ethnicity_counts = BARRIERS.barriers['ethnicity'].value_counts().reset_index()
-    ethnicity_counts.columns = ['ethnicity', 'count']
-    fig_ethnicity = px.pie(ethnicity_counts, names='ethnicity', values='count',
-                        title='Ethnicity Distribution',
-                        labels={'ethnicity': 'Ethnicity', 'count': 'Count'},
-                        hole=0.3)
-    fig_ethnicity.update_traces(textinfo='percent+label', pull=[0.1] * len(ethnicity_counts))
-
-    # Get sex ratio and create figure
-    sex_counts = BARRIERS.barriers['sex'].value_counts().reset_index()
-    sex_counts.columns = ['sex', 'count']
-    fig_sex = px.pie(sex_counts, names='sex', values='count',
-                    title='Sex Distribution',
-                    labels={'sex': 'Sex', 'count': 'Count'},
-                    hole=0.3)
-    fig_sex.update_traces(textinfo='percent+label', pull=[0.1] * len(sex_counts))
-
-    # Get age distribution and create figure
-    age_distribution = BARRIERS.barriers['age'].value_counts().sort_index().reset_index()
-    age_distribution.columns = ['age', 'count']
-    fig_age = px.histogram(age_distribution, x='age', y='count',
-                           title='Age Distribution',
-                           labels={'age': 'Age', 'count': 'Count'},
-                           hover_data=['age', 'count'],
-                           category_orders={"age": list(range(26))},
-                           nbins=20)
+    # Data is shared across reruns (see get_data()); fetch the new submissions on demand
+    if st.sidebar.button("Refresh Data"):
+        BARRIERS.updateData(incremental=True)
+
+    # City counts (cached on the data version)
+    city_count_df = city_counts(BARRIERS.version)
+
+    # Cached figures (only rebuilt when the data changes)
+    fig_ethnicity = build_ethnicity_fig(BARRIERS, BARRIERS.version)
+    fig_sex = build_sex_fig(BARRIERS, BARRIERS.version)
+    fig_age = build_age_fig(BARRIERS, BARRIERS.version)
 
     # Streamlit App Title (App components starts here)
     st.title('Advocacy for People with Disabilities:')
@@ -154,27 +228,22 @@ def main():
     st.sidebar.markdown("[More information and context about this data.](https://github.com/jairus-m/barrierLog/blob/master/README.md)")
     
 
-    # Sidebar for user input
-    i = st.sidebar.number_input("Filter Barrier Count", min_value=1, max_value=BARRIERS.topValues('barrier_list', 1000).count(), value=5)
-    i_city = st.sidebar.number_input("Filter City Count", min_value=1, max_value=CITY_COUNTS['zipcode'].count(), value=5)
-    i_solution_path = st.sidebar.number_input("Filter Solution Path", min_value=1, max_value=BARRIERS.topValues('solution_path', 1000).count(), value=5)
-
-
-
     # all figures plotted below
 
+    total, unique = _kpis(BARRIERS.version)
+
     col1, col2 = st.columns(2)
      # Barriers Reported KPI card
     with col1:
         st.subheader("Barriers Reported")
-        st.metric(label='Total Count', value=BARRIERS.topValues('barrier_list', 10000).sum())
+        st.metric(label='Total Count', value=total)
 
     # Barriers Identified KPI card
     with col2:
         st.subheader("Barriers Identified")
-        st.metric(label='Unique Count', value=BARRIERS.topValues('barrier_list', 10000).count())
+        st.metric(label='Unique Count', value=unique)
 
-    display_top_barriers(i, BARRIERS)
+    top_barriers_section()
 
     st.plotly_chart(fig_ethnicity, use_container_width=True)
 
@@ -182,16 +251,18 @@ def main():
 
     st.plotly_chart(fig_age, use_container_width=True)
 
-    display_city_distribution(i_city, city_counts=CITY_COUNTS)
+    city_section(city_count_df)
 
-    display_solution_pathways(i_solution_path)
+    solution_section()
 
 
+    # Only send the first max_rows rows to the browser (the download has everything)
+    max_rows = st.sidebar.slider("Raw rows to display", 100, 50000, 1000)
     st.subheader(f"Raw Data (n = {len(BARRIERS.barriers)})")
-    st.dataframe(BARRIERS.barriers.drop(columns=['date']))
+    st.dataframe(BARRIERS.barriers.head(max_rows).drop(columns=['date']), width='stretch')
 
     # Load button in sidebar
-    load_csv_data(BARRIERS.barriers)
+    load_csv_data(BARRIERS.version)
 
 
 if __name__ == '__main__':
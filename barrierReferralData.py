@@ -2,10 +2,23 @@ import pandas as pd
 import requests
 import re
 import logging
+import logging.handlers
+import queue
+import atexit
 import os
+import time
 import ast
+import hashlib
+import threading
+from functools import cached_property
 import streamlit as st
 
+try:
+    # orjson decodes the API response ~3x faster than the stdlib
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 # constants for dynamic parsing
 JOTFORM_FIELDS = ['Date', 'Referring Organization', 'Referring Staff Name', 'Family Contact Name', 
                   'Family Contact Address','Family Contact Phone Number', 'Family Contact Email',
@@ -14,6 +27,50 @@ JOTFORM_FIELDS = ['Date', 'Referring Organization', 'Referring Staff Name', 'Fam
                   'Referring Staff Email', 'Referring Staff Phone Number', 'Submission Type',
                     'Age', 'Sex', 'Ethnicity', 'Zipcode']
 
+# jotform field text -> index_field_key key (O(1) lookup, key string built once)
+JOTFORM_FIELD_KEYS = {field: f"{field.replace(' ', '_').lower()}_i" for field in JOTFORM_FIELDS}
+
+# output column -> (index_field_key key, path of keys into the jotform answer object)
+COL_SPEC = {
+    'date': ('date_i', ('prettyFormat',)),
+    'submission_type': ('submission_type_i', ('answer',)),
+    'age': ('age_i', ('answer',)),
+    'sex': ('sex_i', ('answer',)),
+    'ethnicity': ('ethnicity_i', ('answer',)),
+    'barrier_description': ('barrier_description_i', ('answer',)),
+    'barrier_list': ('barriers_i', ('prettyFormat',)),
+    'barrier_cause': ('cause_of_barrier_(optional)_i', ('answer',)),
+    'barrier_solution': ('solution_to_barrier_(optional)_i', ('answer',)),
+    'solution_path': ('solution_pathway_to_barrier_(optional)_i', ('prettyFormat',)),
+    'referring_org': ('referring_organization_i', ('answer',)),
+    'referring_staff': ('referring_staff_name_i', ('prettyFormat',)),
+    'staff_email': ('referring_staff_email_i', ('answer',)),
+    'staff_phone': ('referring_staff_phone_number_i', ('answer', 'full')),
+    'family_contact': ('family_contact_name_i', ('prettyFormat',)),
+    'family_address': ('family_contact_address_i', ('prettyFormat',)),
+    'family_phone': ('family_contact_phone_number_i', ('prettyFormat',)),
+    'family_email': ('family_contact_email_i', ('answer',)),
+    'zipcode': ('zipcode_i', ('answer', 'postal')),
+}
+
+# precompiled regex patterns for address cleaning and zipcode extraction
+_ADDR_CLEAN_RE = re.compile(r'(City:|State|Province:|Postal|Zip\s*Code:|Street\s*Address:|Address\s*Line\s*2:|<br>|/)')
+_WS_RE = re.compile(r'\s+')
+# zipcode general pattern
+_ZIP_RE = re.compile(r'^\d{5}(?:-\d{4})?$')
+# zipcode pattern with start num as 9
+_ZIP9_RE = re.compile(r'\b(9\d{4}(?:-\d{4})?)\b')
+
+# low-cardinality barrier columns stored as categoricals (cheaper value_counts/groupby)
+CATEGORICAL_COLS = ['sex', 'ethnicity', 'zipcode', 'solution_path']
+
+# columns without PHI that make up the barrier data
+BARRIER_COLS = ['date', 'age', 'sex', 'ethnicity', 'zipcode', 'barrier_description', 'barrier_list', 'barrier_solution', 'solution_path']
+
+# dtypes set on the parsed data in updateData (zipcodes stay strings to keep leading zeros)
+COL_DTYPES = {'submission_type': 'category', 'sex': 'category', 'ethnicity': 'category',
+              'zipcode': 'string', 'age': 'Int16'}
+
 try:
     # secrets stored in Streamlit
     API_KEY = st.secrets["API_KEY"]
@@ -23,11 +80,24 @@ except:
     API_KEY = os.getenv("API_KEY")
     FORM_ID = os.getenv("FORM_ID")
 
+# shared HTTP session so repeat API calls reuse the connection/TLS session
+# (requests already sends Accept-Encoding: gzip, deflate and decompresses the body)
+SESSION = requests.Session()
+
+# parsed form data (parquet keeps the dtypes between runs)
+DATA_FILE = 'barrierReferralData.parquet'
 
+# one update at a time (the Streamlit app shares one instance and the parquet file across sessions)
+UPDATE_LOCK = threading.Lock()
 
-# Create a logger instance
+# on-disk copy of the last API response and how long (seconds) it is served before refetching
+RESPONSE_CACHE = 'response.json'
+CACHE_TTL = int(os.getenv('BARRIER_CACHE_TTL', 600))
+
+
+# Create a logger instance (DEBUG records are only kept when BARRIER_LOG_DEBUG is set)
 logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
+logger.setLevel(logging.DEBUG if os.getenv('BARRIER_LOG_DEBUG') else logging.INFO)
 
 # Create a file handler
 handler = logging.FileHandler('json_processing.log', 'w')
@@ -37,8 +107,13 @@ handler.setLevel(logging.DEBUG)
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(lineno)d - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 handler.setFormatter(formatter)
 
-# Add the handler to the logger
-logger.addHandler(handler)
+# Add the handler to the logger through a queue so the file writes happen on a
+# background thread instead of blocking the caller
+log_queue = queue.SimpleQueue()
+listener = logging.handlers.QueueListener(log_queue, handler)
+listener.start()
+atexit.register(listener.stop)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
 
 class BarrierReferralData():
     """
@@ -47,81 +122,110 @@ class BarrierReferralData():
     class methods that aid in analysis, updating data, and retreiving meta data on the API/JSON response.
     Attributes:
         data : pandas dataframe containing all data (including contact information)
-        response : contains the json response object
+        response : contains the json response object (after an incremental update, the new forms are added to the front of it)
         meta : contains meta data on API limit, json keys, and active entries
-        barriera : dataframe that contains the barrier data only (no contact information)
+        barriers : dataframe that contains the barrier data only (no contact information), built on first access after each update
+        version : hash of the data that changes whenever the data changes (cheap cache key)
+        last_created : created_at of the newest submission parsed by updateData (incremental updates start here, saved with the parquet data)
     Methods:
-        updateData : updates all attributes, processes json from _callAPI(), and outputs a pandas dataframe
+        updateData : updates all attributes, processes json from _callAPI(), and outputs a pandas dataframe (optionally only the new forms)
+        __updateData : does the work of updateData() while UPDATE_LOCK is held
         barrierData : returns barrier data only (no PHI)
-        topValues : takes _masterList() and returns a pd.Series with the top i values
+        valueCounts : takes _masterList() and returns the (memoized) count of each value, most common first
+        topValues : returns a pd.Series with the top i values of valueCounts()
         latestDate : returns the most recent date in the data
         info : creates meta data dict object and loads into self.meta
-        __callAPI : calls Jotform API to load data as a JSON object
-        __loadData : loads csv data and if not present, will call updateData()
+        __callAPI : calls Jotform API to load data as a JSON object (served from RESPONSE_CACHE while fresh)
+        __loadData : loads parquet data and if not present (or older than the response), will call updateData()
         __createIndexFieldKey : creates the jotform_field_i : string_integer key-value pair that is necessary for dynamic parsing
         __masterList : creates a single list of values from a column of lists
-        __parseAddress : uses regex to parse address data in json object
-        __parseReferringOrg : parses the data related to the referral organization
-        __parseFamily : parses the data related to the family contact
-        __parseBarrierLog : parases the data related to barrier incidents
+        __getAnswer : follows a COL_SPEC path into a jotform answer object
+        __parseAddress : uses regex to clean the family address column
         __formatSubmissionTypeCol: Asserts/formats the three submission types: ['Barrier Log', 'Self-Referral', 'Organization Referral]
-        __extractZipcode: Extract zipcode via regex from family address field
+        __extractZipcode: Extract zipcode via regex from a single family address
+        __extractZipcodes: Extract zipcodes via regex from the family address column
+        __dataVersion : returns a hash of self.data used as the version attribute
     """
     def __init__(self):
         """
         Constructor with no args.
         """
-        self.data = self.__loadData()
         self.response = self.__callAPI()
         self.index_field_key = self.__createIndexFieldKey(self.response)
+        self.last_created = None
+        self.data = self.__loadData()
         self.meta = self.info()
-        self.barriers = self.barrierData()
+        self.version = self.__dataVersion()
+        self.__value_counts = {}
         self.latestDate = self.latestDate()
 
     def __loadData(self):
         """
-        This method loads the csv data into the self.data attribute and if the 
-        csv is not present, will call updateData() (only called when class is instantiated).
+        This method loads the parquet data into the self.data attribute. If the file is
+        not present, or the response that was already fetched is newer than it, it calls
+        updateData() with that response instead (only called when class is instantiated).
         Args:
             None
         Returns:
             data (pandas.dataframe) : data containing clean form responses
         """
-        if not os.path.exists('barrierReferralData.csv'):
-            data = self.updateData()
-            logging.debug(f'Updated the data from API.')
+        # the response cache is rewritten on every full API call and the parquet file on every
+        # update, so a newer response means the saved data is out of date
+        if not os.path.exists(DATA_FILE) or os.path.getmtime(RESPONSE_CACHE) > os.path.getmtime(DATA_FILE):
+            data = self.updateData(self.response)
+            logging.debug('Updated the data from API.')
         else:
-            data = pd.read_csv('barrierReferralData.csv')
-            logging.debug(f'Loaded the data from CSV.')
+            data = pd.read_parquet(DATA_FILE)
+            # the incremental update watermark is saved with the data (see updateData)
+            self.last_created = data.attrs.get('last_created')
+            logging.debug('Loaded the data from %s.', DATA_FILE)
 
         return data
 
-    def __callAPI(self):
+    def __callAPI(self, use_cache : bool = True, since : str = None):
         """
-        This method makes an API call to Jotform and returns a JSON object.
+        This method makes an API call to Jotform and returns a JSON object. While the
+        on-disk copy of the last response is younger than CACHE_TTL it is returned instead,
+        and every successful full call overwrites that copy.
         Args:
-            None
+            use_cache (bool) : serve the on-disk response if it is still fresh
+            since (str) : only fetch submissions created after this 'YYYY-MM-DD HH:MM:SS' timestamp
         Returns:
             data (JSON object) : data containing the response from API request
         """
+        if since is None and use_cache and os.path.exists(RESPONSE_CACHE) and time.time() - os.path.getmtime(RESPONSE_CACHE) < CACHE_TTL:
+            with open(RESPONSE_CACHE, 'rb') as f:
+                data = json_loads(f.read())
+            logging.debug('Loaded the API response from %s.', RESPONSE_CACHE)
+            return data
+
         api_key = API_KEY
         form_ID = FORM_ID
         limit = 1000
 
         api_url_submissions = f'https://hipaa-api.jotform.com/form/{form_ID}/submissions?apiKey={api_key}&limit={limit}'
 
+        # only ask for the new submissions on an incremental update
+        params = {'filter': f'{{"created_at:gt":"{since}"}}'} if since is not None else None
 
         # Make a GET request to the API
-        response = requests.get(api_url_submissions)
+        response = SESSION.get(api_url_submissions, params=params, timeout=30)
 
         # Check the response status code
         if response.status_code == 200:
             # If the status code is 200, the request was successful
-            data = response.json()  # Assuming the API returns JSON data
-            logging.debug(f"Succesfully retrieved data. Status code: {response.status_code}")
+            data = json_loads(response.content)  # Assuming the API returns JSON data
+            logging.debug("Succesfully retrieved data. Status code: %s", response.status_code)
+
+            # write-through to the on-disk cache (os.replace so readers never see a partial file);
+            # a filtered response only holds the new submissions so it is not cached
+            if since is None:
+                with open(f'{RESPONSE_CACHE}.tmp', 'wb') as f:
+                    f.write(response.content)
+                os.replace(f'{RESPONSE_CACHE}.tmp', RESPONSE_CACHE)
         else:
             # If the status code is not 200, there was an error
-            logging.debug(f"Failed to retrieve data. Status code: {response.status_code}")
+            logging.error("Failed to retrieve data. Status code: %s", response.status_code)
 
         return data
     
@@ -137,18 +241,18 @@ class BarrierReferralData():
 
         """
         self.index_field_key = {}
-        for i in list(data['content'][0]['answers'].keys()):
-            json_object = data['content'][0]['answers'][i]['text']
-            if json_object in JOTFORM_FIELDS:
-                self.index_field_key[f"{json_object.replace(' ', '_').lower()}_i"] = i
+        for i, answer in data['content'][0]['answers'].items():
+            field_key = JOTFORM_FIELD_KEYS.get(answer['text'])
+            if field_key is not None:
+                self.index_field_key[field_key] = i
         return self.index_field_key
     
-    def info(self):
+    def info(self, active_entries : int = None):
         """
         This method returns meta data on form/API and loads it into the self.meta attribute. The meta
         data includes API limit left, total active entries, and the keys of self.response (json object)
         Args:
-            None
+            active_entries (int) : optional number of active entries if they were already counted
         Returns:
             dict : dictionary containing meta data
         """
@@ -157,103 +261,167 @@ class BarrierReferralData():
         info['limit_left'] = data['limit-left']
         info['json_keys'] = data.keys()
 
-        active_entries = 0
-        for entry in data['content']:
-            if entry['status'] == 'ACTIVE':
-                active_entries += 1
+        if active_entries is None:
+            active_entries = sum(1 for entry in data['content'] if entry['status'] == 'ACTIVE')
             
         info['active_entries'] = active_entries
         return info
     
-    def updateData(self):
+    def updateData(self, response : dict = None, incremental : bool = False):
         """
         This method processes the JSON object and returns a pandas dataframe and updates the 
-        meta, data, barrierData and response attributes when called.
+        meta, data, barrierData and response attributes when called. An incremental update only
+        fetches the submissions created after last_created and adds them to the saved data; it
+        falls back to a full refresh when there is no saved data yet. Edits to or deletions of
+        older submissions are only picked up by a full refresh.
         Args:
-            None
+            response (dict) : optional API response that was just fetched; if None the API is called
+            incremental (bool) : only fetch and parse the submissions created since the last update
         Returns:
             df (pandas.dataframe) : data containing clean form responses
         """
-        # call jotform API
-        self.response = self.__callAPI()
-        data = self.response
-        self.index_field_key = self.__createIndexFieldKey(data)
+        with UPDATE_LOCK:
+            return self.__updateData(response, incremental)
+
+    def __updateData(self, response : dict, incremental : bool):
+        """
+        Does the work of updateData() while UPDATE_LOCK is held.
+        Args:
+            response (dict) : optional API response that was just fetched; if None the API is called
+            incremental (bool) : only fetch and parse the submissions created since the last update
+        Returns:
+            df (pandas.dataframe) : data containing clean form responses
+        """
+        since = self.last_created if incremental and os.path.exists(DATA_FILE) else None
+
+        # call jotform API (always fetch fresh data on an update) unless a response was passed in
+        data = response if response is not None else self.__callAPI(use_cache=False, since=since)
+        if since is None:
+            self.response = data
+        else:
+            # a filtered response only holds the new forms, so put them in front of the last
+            # response (newest first, like the API) to keep self.response matching self.data
+            self.response = {**self.response, 'content': data['content'] + self.response['content'],
+                             'limit-left': data['limit-left']}
+        if data['content']:
+            self.index_field_key = self.__createIndexFieldKey(data)
+
+        # jotform created_at timestamps sort as strings
+        self.last_created = max((entry['created_at'] for entry in data['content']), default=since)
+
+        # filter the active forms once
+        active = [entry['answers'] for entry in data['content'] if entry['status'] == 'ACTIVE']
 
         # update meta attribute
-        self.meta = self.info()
+        self.meta = self.info(len(active) if since is None else len(active) + len(self.data))
+
+        if since is not None and not active:
+            logging.debug('No new forms since %s.', since)
+            return self.data
+
+        # build one list per column (column-oriented, so pandas doesn't infer dtypes row by row)
+        cols = {}
+        for col, (field, path) in COL_SPEC.items():
+            # resolve the jotform field id once per column instead of once per form
+            field_id = self.index_field_key[field]
+            if len(path) == 1:
+                cols[col] = [form_i.get(field_id, {}).get(path[0], pd.NA) for form_i in active]
+            else:
+                cols[col] = [self.__getAnswer(form_i.get(field_id, {}), path) for form_i in active]
+
+        # create pandas dataframe from dict of lists
+        df = pd.DataFrame(cols, copy=False)
+        logging.debug('Parsed %s active forms.', len(df))
+
+        # 'Other' choices come back as {'other': <text>}
+        for col in ['sex', 'ethnicity']:
+            df[col] = df[col].map(lambda x: x.get('other', pd.NA) if isinstance(x, dict) else x)
 
-        # column names of csv data
-        csv_data = [['date', 'submission_type', 'age', 'sex', 'ethnicity', 'barrier_description', 'barrier_list', 
-                     'barrier_cause', 'barrier_solution', 'solution_path', 'referring_org', 
-                     'referring_staff', 'staff_email', 'staff_phone','family_contact', 'family_address', 
-                     'family_phone', 'family_email','zipcode']]
-        
-        # iterate through json and format/clean data
-        for i in range(len(data['content'])):
-            if data['content'][i]['status'] == 'ACTIVE':
-                # form_i is the JSON object object containg all data of form i
-                form_i = data['content'][i]['answers']
-                # submission type
-                submission_type = form_i[self.index_field_key['submission_type_i']].get('answer', pd.NA)
-                # date
-                date_referred = form_i[self.index_field_key['date_i']].get('prettyFormat', pd.NA)
-                logging.debug(f'Added date : {date_referred}', )
-                # parse organization data
-                referring_org, referring_staff, staff_email, staff_phone = self.__parseReferrringOrg(i, date_referred)
-                # parse family data
-                family_contact, family_address, family_phone, family_email = self.__parseFamily(i, date_referred)
-                # parse barrier log data
-                barrier_description, barrier_list, barrier_cause, barrier_solution, solution_path = self.__parseBarrierLog(i, date_referred)
-                # parse demographic data
-                zipcode, age, sex, ethnicity = self.__parseDemographics(i, date_referred)
-                
-                if pd.isna(zipcode) == True and pd.isna(family_address) == False:
-                    zipcode = self.__extractZipcode(family_address)
-
-                # create tuple for data
-                row = [date_referred, submission_type, age, sex, ethnicity, barrier_description, barrier_list, 
-                       barrier_cause, barrier_solution, solution_path, referring_org, 
-                       referring_staff, staff_email, staff_phone, family_contact, family_address, 
-                       family_phone, family_email, zipcode]
-                csv_data.append(row)
-
-        # create pandas dataframe from list of tuples
-        df = pd.DataFrame(csv_data[1:], columns=csv_data[0])
+        df['family_address'] = self.__parseAddress(df['family_address'])
+
+        # fall back to the zipcode in the family address
+        missing = df['zipcode'].isna() & df['family_address'].notna()
+        df.loc[missing, 'zipcode'] = self.__extractZipcodes(df.loc[missing, 'family_address'])
 
         df['submission_type'] = self.__formatSubmissionTypeCol(df['submission_type'])
 
-        # write df to csv file
-        df.to_csv('barrierReferralData.csv', index=False) 
+        # parse dates once (parquet keeps the datetime dtype between runs)
+        df['date'] = pd.to_datetime(df['date'], errors='coerce', format='mixed')
+
+        # set explicit dtypes; non-numeric or out of range ages become NA (so they fit Int16)
+        # and fractional ages are floored
+        age = pd.to_numeric(df['age'], errors='coerce') // 1
+        df['age'] = age.where(age.between(0, 150))
+        df = df.astype(COL_DTYPES)
+
+        if since is not None:
+            # new forms go first like in the full response; re-cast since concat drops
+            # categoricals whose categories differ
+            df = pd.concat([df, self.data], ignore_index=True).astype(COL_DTYPES)
+            logging.debug('Added %s new forms.', len(active))
+
+        # write df to parquet file (attrs are kept in the parquet metadata)
+        df.attrs['last_created'] = self.last_created
+        # (through a tmp file and os.replace so readers never see a partial file)
+        df.to_parquet(f'{DATA_FILE}.tmp', compression='zstd', index=False)
+        os.replace(f'{DATA_FILE}.tmp', DATA_FILE)
 
-        # update self.data and self.barrierData attributes
+        # update self.data and drop the cached barrier data (rebuilt on next access)
         self.data = df
-        self.barriers = self.barrierData()
+        self.__dict__.pop('barriers', None)
+        self.version = self.__dataVersion()
+        self.__value_counts = {}
 
-        logging.debug(f'Updated the data from API.')
+        logging.debug('Updated the data from API.')
 
         return df 
     
     def barrierData(self):
         """
-        Returns the dataframe without any PHI. Barrier data only.
+        Returns the dataframe without any PHI. Barrier data only. The
+        low-cardinality columns in CATEGORICAL_COLS are converted to categoricals.
+        Args:
+            None
+        Returns:
+            df (pandas.dataframe) : barrier only data in pd.dataframe
+        """
+        return self.data[BARRIER_COLS].astype({col: 'category' for col in CATEGORICAL_COLS})
+
+    @cached_property
+    def barriers(self):
+        """
+        The barrierData() dataframe, built once per version of the data. updateData
+        clears it so the next access rebuilds it.
         Args:
             None
         Returns:
             df (pandas.dataframe) : barrier only data in pd.dataframe
         """
-        return self.data.loc[:, ['date', 'age', 'sex', 'ethnicity', 'zipcode', 'barrier_description', 'barrier_list', 'barrier_solution', 'solution_path']]
+        return self.barrierData()
     
+    def valueCounts(self, col : str):
+        """
+        Returns the count of every value in a column, most common first. The value counts
+        of each column are memoized until the data is updated.
+        Args:
+            col (str) : column of interest to make a single list of values from ['barrier_list', 'solution_path']
+        Returns:
+            pandas.Series : count of each value in ['barrier_list', 'solution_path']
+        """
+        if col not in self.__value_counts:
+            self.__value_counts[col] = pd.Series(self.__masterList(col)).value_counts()
+        return self.__value_counts[col]
+
     def topValues(self, col : str, i : int):
         """
-        Returns the top i occurences of values in a column.
+        Returns the top i occurences of values in a column (slices valueCounts()).
         Args:
             col (str) : column of interest to make a single list of values from ['barrier_list', 'solution_path']
             i (int) : how many of the top i values to return
         Returns:
             pandas.Series : top i occuring values in ['barrier_list', 'solution_path']
         """
-        df = self.barriers
-        return pd.Series(self.__masterList(col)).value_counts().head(int(i))
+        return self.valueCounts(col).head(int(i))
     
     def latestDate(self):
         """
@@ -264,7 +432,7 @@ class BarrierReferralData():
         Returns:
             date (string) : date of the latest date in data (mm-dd-yyyy)
         """
-        return self.data['date'].sort_values(ascending=False)[0]
+        return self.data['date'].max().strftime('%m-%d-%Y')
     
     def __masterList(self, col : str):
         """
@@ -275,230 +443,119 @@ class BarrierReferralData():
         Returns:
             master_list (list) : single list of all input values
         """ 
-        df = self.barriers
-
-        master_list = []
-        for row in df[col]:
-            if pd.isna(row) == False:
-                master_list.extend(row.split(';'))
-        return master_list
+        # one vectorized split/flatten instead of a pd.isna() check per row
+        return self.barriers[col].dropna().astype(str).str.split(';').explode().tolist()
             
-    def __parseAddress(self, i : int):
+    def __getAnswer(self, answer : dict, path : tuple):
         """
-        This helper function parses the address from JSON response data. Does not validate
-        the addresses themselves.
+        This helper function follows a path of keys (from COL_SPEC) into a jotform
+        answer object.
         Args:
-            i (int) : index i corresponding to the form index in the for loop of updateData()
+            answer (dict) : answer object of a single form field
+            path (tuple) : keys to follow, e.g. ('answer', 'postal')
         Returns:
-            cleaned_address (string) : string containing cleaned/parsed address 
+            value at the end of the path or pd.NA if any key is missing
         """
-        data = self.response
-
-        # form_i is the JSON object object containg all data of form i
-        form_i = data['content'][i]['answers']
-
-        # address text
-        address_text = form_i[self.index_field_key['family_contact_address_i']].get('prettyFormat', pd.NA)
+        for k in path:
+            if not isinstance(answer, dict):
+                return pd.NA
+            answer = answer.get(k, pd.NA)
+        return answer
 
-        if pd.isna(address_text) == False:
-            # define a regex pattern to remove unwanted text
-            pattern = re.compile(r'(City:|State|Province:|Postal|Zip\s*Code:|Street\s*Address:|Address\s*Line\s*2:|<br>|/)')
-
-            # use re.sub to replace the matched pattern with an empty string
-            cleaned_address = re.sub(pattern, ' ', address_text).strip()
-
-            # replace consecutive spaces with a single space
-            cleaned_address = re.sub(r'\s+', ' ', cleaned_address)
-
-            return cleaned_address
-        else:
-            return address_text
-        
-    def __parseReferrringOrg(self, i : int, date_referred : str):
+    def __parseAddress(self, addresses : pd.Series):
         """
-        This helper function parses the referring org name, staff name,
-        staff email, and staff phone number.
+        This helper function cleans the family addresses from the JSON response data.
+        Does not validate the addresses themselves.
         Args:
-            i (int) : integer index corresponding to form item in for loop of updateData()
-            date_referred : date referred that corresponds to form i's referral date
+            addresses (pd.Series) : family address column (jotform prettyFormat text)
         Returns:
-            tuple : tuple containing strings from target data 
+            cleaned_address (pd.Series) : column containing cleaned/parsed addresses
         """
-        data = self.response
-
-        # form_i is the JSON object object containg all data of form i
-        form_i = data['content'][i]['answers']
-
-        # org
-        referring_org = form_i[self.index_field_key['referring_organization_i']].get('answer', pd.NA)
-        logging.debug(f'Added org : {date_referred}')
+        # replace the unwanted labels/tags with an empty string
+        cleaned_address = addresses.str.replace(_ADDR_CLEAN_RE, ' ', regex=True).str.strip()
 
-        # referring staff
-        referring_staff = form_i[self.index_field_key['referring_staff_name_i']].get('prettyFormat', pd.NA)
-        logging.debug(f'Added staff : {date_referred}')
-        
+        # replace consecutive spaces with a single space
+        return cleaned_address.str.replace(_WS_RE, ' ', regex=True)
 
-        # referring staff email
-        staff_email = form_i[self.index_field_key['referring_staff_email_i']].get('answer', pd.NA)
-        logging.debug(f'Added staff email : {date_referred}')
-
-        # referring staff number
-        staff_phone = form_i[self.index_field_key['referring_staff_phone_number_i']].get('answer', {}).get('full', pd.NA)
-        logging.debug(f'Added staff from form : {date_referred}')
-
-        return referring_org, referring_staff, staff_email, staff_phone
-    
-    def __parseFamily(self, i : int, date_referred : str):
-        """
-        This helper function parses the family data.
-        Args:
-            i (int) : integer index corresponding to form item in for loop of updateData()
-            date_referred : date referred that corresponds to form i's referral date
-        Returns:
-            tuple : tuple containing strings from target data
+    def __formatSubmissionTypeCol(self, submission_type_col: pd.Series):
         """
-        data = self.response
-
-        # form_i is the JSON object object containg all data of form i
-        form_i = data['content'][i]['answers']
-
-         # family contact
-        family_contact = form_i[self.index_field_key['family_contact_name_i']].get('prettyFormat', pd.NA)
-        logging.debug(f'Added family contacat from form : {date_referred}')
-
-        # address
-        family_address = self.__parseAddress(i)
-        logging.debug(f'Added address from form : {date_referred}')
-
-        # family phone
-        family_phone = form_i[self.index_field_key['family_contact_phone_number_i']].get('prettyFormat', pd.NA)
-        logging.debug(f'Added family phone from form : {date_referred}')
-
-        # family contact email
-        family_email = form_i[self.index_field_key['family_contact_email_i']].get('answer', pd.NA)
-        logging.debug(f'Added family email from form : {date_referred}')
+        Asserts/formats the three submission types: ['Barrier Log', 'Self-Referral', 'Organization Referral]
 
-        return family_contact, family_address, family_phone, family_email
-    
-    def __parseBarrierLog(self, i : int, date_referred : str):
-        """
-        This helper function parses the barrier log data.
         Args:
-            i (int) : integer index corresponding to form item in for loop of updateData()
-            date_referred : date referred that corresponds to form i's referral date
+            submission_type_col: column in self.data containing submission type
         Returns:
-            tuple : tuple containing strings or lists from target data 
+            (pd.Series) categorical submission_type_col w/ appropriate categories
         """
-        data = self.response
-
-        # form_i is the JSON object object containg all data of form i
-        form_i = data['content'][i]['answers']
+        correct_values = ['Barrier Log', 'Self-Referral', 'Organization Referral']
 
-         # barrier memo
-        barrier_description = form_i[self.index_field_key['barrier_description_i']].get('answer', pd.NA)
-        logging.debug(f'Added barrier memo from form : {date_referred}')
+        # Mapping dictionary for replacement
+        referral_mapping = {
+            'Barrier Log Only (non-referral)': 'Barrier Log'
+        }
 
-        # barrier list 
-        barrier_list = form_i[self.index_field_key['barriers_i']].get('prettyFormat', pd.NA)
-        logging.debug(f'Added barrier list item from form : {date_referred}')
+        # Replace values based on mapping
+        mapped = submission_type_col.replace(referral_mapping)
 
-        # cause to barrier
-        barrier_cause = form_i[self.index_field_key['cause_of_barrier_(optional)_i']].get('answer', pd.NA)
-        logging.debug(f'Added cause to barrier from form : {date_referred}')
+        # Anything that isn't one of the three types is a Self-Referral
+        mapped = mapped.where(mapped.isin(correct_values), 'Self-Referral')
 
-        # solution to barrier
-        barrier_solution = form_i[self.index_field_key['solution_to_barrier_(optional)_i']].get('answer', pd.NA)
-        logging.debug(f'Added solution to barrier from form : {date_referred}')
+        return mapped.astype(pd.CategoricalDtype(correct_values))
 
-        # solution pathway 
-        solution_path = form_i[self.index_field_key['solution_pathway_to_barrier_(optional)_i']].get('prettyFormat', pd.NA)
-        logging.debug(f'Added solution pathway list item from form : {date_referred}')
 
-        return barrier_description, barrier_list, barrier_cause, barrier_solution, solution_path
-    
-    def __parseDemographics(self, i : int, date_referred : str):
+    def __extractZipcode(self, family_address : str):
         """
-        This helper function parses the demographic (Zipcode/Sex/Ethnicity) from JSON response data. 
+        Extract zipcode via regex from a single family address (see __extractZipcodes()).
+
         Args:
-            i (int) : index i corresponding to the form index in the for loop of updateData()
-            date_referred : date referred that corresponds to form i's referral date
+            family_adress: cleaned family address
         Returns:
-            zipcode, age, sex, ethnicity (tuple) : tuple containing strings or lists from target data
+            zipcode: zipcode string (NaN if no zipcode is found)
         """
-        data = self.response
-
-         # form_i is the JSON object object containg all data of form i
-        form_i = data['content'][i]['answers']
-
-         # zipcode
-        zipcode = form_i[self.index_field_key['zipcode_i']].get('answer', {}).get('postal', pd.NA)
-        logging.debug(f'Added zipcode from form : {date_referred}')
-
-        # age
-        age = form_i[self.index_field_key['age_i']].get('answer', pd.NA)
-        logging.debug(f'Added age from form : {date_referred}')
-
-        # sex  
-        if 'prettyFormat' in list(form_i[self.index_field_key['sex_i']].keys()):
-            sex = form_i[self.index_field_key['sex_i']].get('answer', {}).get('other', pd.NA)
-        else:
-            sex = form_i[self.index_field_key['sex_i']].get('answer', pd.NA)
-        logging.debug(f'Added sex from form : {date_referred}')
-
-        # ethnicity
-        if 'prettyFormat' in list(form_i[self.index_field_key['ethnicity_i']].keys()):
-            ethnicity = form_i[self.index_field_key['ethnicity_i']].get('answer', {}).get('other', pd.NA)
-        else:
-            ethnicity = form_i[self.index_field_key['ethnicity_i']].get('answer', '')
-        logging.debug(f'Added ethnicity from form : {date_referred}')
+        return self.__extractZipcodes(pd.Series([family_address])).iloc[0]
 
-        return zipcode, age, sex, ethnicity
-    
-    def __formatSubmissionTypeCol(self, submission_type_col: pd.Series):
+    def __extractZipcodes(self, family_addresses : pd.Series):
         """
-        Asserts/formats the three submission types: ['Barrier Log', 'Self-Referral', 'Organization Referral]
+        Extract zipcodes via regex from the family address column for the
+        rows where the zipcode field is null.
 
         Args:
-            submission_type_col: column in self.data containing submission type
+            family_addresses (pd.Series): cleaned family addresses
         Returns:
-            (pd.Series) submission_type_col w/ appropriate categories
+            zipcodes (pd.Series): zipcode strings (NaN if no zipcode is found)
         """
-        correct_values = ['Barrier Log', 'Self-Referral', 'Organization Referral']
-
-        # Mapping dictionary for replacement
-        referral_mapping = {
-            'Barrier Log Only (non-referral)': 'Barrier Log'
-        }
-
-        # Replace values based on mapping
-        mapped = list(submission_type_col.replace(referral_mapping))
-
-        return pd.Series([x if x in correct_values else 'Self-Referral' for x in mapped])
+        # do the last 5 characters match the general zipcode pattern?
+        family_address_zipcode = family_addresses.str[-5:]
+        is_zipcode = family_address_zipcode.str.match(_ZIP_RE).fillna(False).astype(bool)
 
+        # if not, look for any string that matches the 9**** pattern in the address
+        return family_address_zipcode.where(is_zipcode, family_addresses.str.extract(_ZIP9_RE, expand=False))
 
-    def __extractZipcode(self, family_address : str):
+    def __dataVersion(self):
         """
-        Extract zipcode via regex from family address field if
-        zipcde from _parseDemographics() is null.
+        Returns a hash of self.data. It only changes when the data changes (including
+        the order of the rows), so it can be used as a cache key instead of hashing the
+        dataframe on every lookup.
 
         Args:
-            family_adress: family_adress from._parseFamily()
+            None
         Returns:
-            zipcode: zipcode string
-        """
-        # extract zipcodes from family address
-        # zipcode general pattern
-        pattern = r'^\d{5}(?:-\d{4})?$'
-        family_address_zipcode = family_address[-5:]
-        # does the extracted zipcode match the pattern?
-        if bool(re.match(pattern, family_address_zipcode)):
-            zipcode = family_address_zipcode
-        # if not, look for any string that matches the 9**** pattern in the address
-        else: 
-            # zipcode pattern with start num as 9
-            pattern = r'\b9\d{4}(?:-\d{4})?\b'
-            match = re.search(pattern, family_address)
-            zipcode = match.group()
+            int : hash of the current data
+        """
+        # hash the row hashes as one array (a sum would ignore the order of the rows)
+        row_hashes = pd.util.hash_pandas_object(self.data, index=False).to_numpy()
+        return int.from_bytes(hashlib.blake2b(row_hashes.tobytes(), digest_size=8).digest(), 'little')
 
-        return zipcode
 
+@st.cache_resource(ttl=CACHE_TTL)
+def get_data():
+    """
+    Returns a BarrierReferralData instance shared across Streamlit reruns and sessions.
+    The instance is rebuilt at most once per CACHE_TTL; the response is only re-parsed
+    when it is newer than the saved data (see __loadData). Call .updateData() on it to
+    force a refresh.
+    Args:
+        None
+    Returns:
+        BarrierReferralData : shared class instance
+    """
+    return BarrierReferralData()
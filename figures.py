@@ -0,0 +1,111 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+from barrierReferralData import BarrierReferralData
+
+# Figure builders for the Streamlit app. Each one is cached with st.cache_resource:
+# st.cache_data would unpickle (and so re-validate) the figure on every hit, which
+# costs more than building a small pie or bar chart. The figures are shared across
+# sessions, so they must not be mutated after they are built (st.plotly_chart only
+# reads them). Data arguments are prefixed with an underscore so Streamlit skips
+# hashing them; the cache is keyed on the data version instead. max_entries keeps
+# old versions (and old bar counts i) from piling up on a long running server.
+# plotly.express is imported inside the builders that use it, so it is only
+# loaded on a cache miss.
+
+@st.cache_resource(ttl="1h", max_entries=4)
+def build_ethnicity_fig(_barriers: BarrierReferralData, version: int):
+    """
+    Build the ethnicity distribution pie chart.
+
+    Args:
+        _barriers: BarrierReferralData class object.
+        version (int): _barriers.version, changes whenever the data is updated.
+    Returns:
+        plotly.graph_objects.Figure: ethnicity distribution figure
+    """
+    ethnicity_counts = _barriers.barriers['ethnicity'].value_counts(sort=False).reset_index()
+    ethnicity_counts.columns = ['ethnicity', 'count']
+    fig_ethnicity = go.Figure(go.Pie(labels=ethnicity_counts['ethnicity'], values=ethnicity_counts['count'],
+                                     hole=0.3, textinfo='percent+label', pull=0.1,
+                                     hovertemplate='Ethnicity=%{label}<br>Count=%{value}<extra></extra>'))
+    fig_ethnicity.update_layout(title='Ethnicity Distribution')
+    return fig_ethnicity
+
+@st.cache_resource(ttl="1h", max_entries=4)
+def build_sex_fig(_barriers: BarrierReferralData, version: int):
+    """
+    Build the sex distribution pie chart.
+
+    Args:
+        _barriers: BarrierReferralData class object.
+        version (int): _barriers.version, changes whenever the data is updated.
+    Returns:
+        plotly.graph_objects.Figure: sex distribution figure
+    """
+    sex_counts = _barriers.barriers['sex'].value_counts(sort=False).reset_index()
+    sex_counts.columns = ['sex', 'count']
+    fig_sex = go.Figure(go.Pie(labels=sex_counts['sex'], values=sex_counts['count'],
+                               hole=0.3, textinfo='percent+label', pull=0.1,
+                               hovertemplate='Sex=%{label}<br>Count=%{value}<extra></extra>'))
+    fig_sex.update_layout(title='Sex Distribution')
+    return fig_sex
+
+@st.cache_resource(ttl="1h", max_entries=4)
+def build_age_fig(_barriers: BarrierReferralData, version: int):
+    """
+    Build the age distribution bar chart from the already counted ages.
+
+    Args:
+        _barriers: BarrierReferralData class object.
+        version (int): _barriers.version, changes whenever the data is updated.
+    Returns:
+        plotly.graph_objects.Figure: age distribution figure
+    """
+    age_distribution = _barriers.barriers['age'].value_counts(sort=False).sort_index().reset_index()
+    age_distribution.columns = ['age', 'count']
+    fig_age = go.Figure(go.Bar(x=age_distribution['age'], y=age_distribution['count'],
+                               hovertemplate='Age=%{x}<br>Count=%{y}<extra></extra>'))
+    fig_age.update_layout(title='Age Distribution', xaxis_title='Age', yaxis_title='Count')
+    return fig_age
+
+@st.cache_resource(ttl="1h", max_entries=32)
+def build_solution_fig(_solution_counts: pd.Series, version: int, i: int):
+    """
+    Build the top solution pathways bar chart.
+
+    Args:
+        _solution_counts (pd.Series): count of each solution path, most common first (not hashed).
+        version (int): version of the data the counts were computed from.
+        i (int): Number of solution paths to display in the bar graph.
+    Returns:
+        plotly.graph_objects.Figure: solution pathways figure
+    """
+    import plotly.express as px
+
+    top_solution_data = _solution_counts.head(i)
+    fig_solution = px.bar(top_solution_data, x=top_solution_data.index, y=top_solution_data.values,
+                        labels={'y': 'Count', 'index': ' '},
+                        title='Top Solution Pathways')
+    return fig_solution
+
+@st.cache_resource(ttl="1h", max_entries=32)
+def build_city_fig(_city_counts: pd.DataFrame, version: int, i: int):
+    """
+    Build the city distribution bar chart.
+
+    Args:
+        _city_counts (pd.DataFrame): df containing city counts (not hashed).
+        version (int): version of the data the counts were computed from.
+        i (int): Number of cities to display in the distribution.
+    Returns:
+        plotly.graph_objects.Figure: city distribution figure
+    """
+    import plotly.express as px
+
+    city_counts_i = _city_counts[:i]
+    city_counts_i.columns = ['zipcode', 'count']
+    fig_city = px.bar(city_counts_i, x='zipcode', y='count',
+                    title='City Distribution',
+                    labels={'zipcode': 'City', 'count': 'Count'})
+    return fig_city
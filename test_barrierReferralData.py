@@ -1,35 +1,92 @@
+import barrierReferralData
 from barrierReferralData import BarrierReferralData
+import pandas as pd
 import unittest
+from unittest.mock import Mock, patch
+import tempfile
+import json
+import copy
+import os
+import time
+import threading
 
-X = BarrierReferralData()
+# synthetic Jotform API response (no real submissions) served instead of the live API
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_response.json')
+
+class FakeJotform():
+    """
+    Stands in for SESSION.get. Every call returns the fixture (only the submissions
+    created after a created_at:gt filter, if given) and uses up one request of limit-left.
+    """
+    def __init__(self, path : str):
+        with open(path) as f:
+            self.response = json.load(f)
+
+    def get(self, url, params=None, timeout=None):
+        self.response['limit-left'] -= 1
+        data = dict(self.response)
+        if params is not None:
+            since = json.loads(params['filter'])['created_at:gt']
+            data['content'] = [entry for entry in data['content'] if entry['created_at'] > since]
+        return Mock(status_code=200, content=json.dumps(data).encode())
 
 class TestBarrierData(unittest.TestCase):
     """
     This suite of tests validates the response and methods of the BarrierReferralData class.
+    The API is replaced by FakeJotform and the cached response/parquet files go to a temp
+    directory, so one instance (cls.X) is shared by all tests without touching Jotform.
     Tests:
         test_Response : test for succesfull API call
         test_ActiveEntires : tests for correct amount of active entires
         test_Cols : test to make sure the pandas dataframe contains the correct columns
         test_UpdateData : tests for correct functionality of updateData()
         test_ExtractZipcode : tests for correct zipcode extraction of _extractZipcode()
+        test_Version : tests that the data version only changes when the data changes
+        test_CategoricalCols : tests that the low-cardinality barrier columns are categoricals
+        test_FormatSubmissionTypeCol : tests the submission type mapping of _formatSubmissionTypeCol()
+        test_LatestDate : tests that latestDate is the most recent date in the data
+        test_Dtypes : tests the explicit dtypes set on the parsed data (and that out of range ages become NA)
+        test_IncrementalUpdate : tests that an incremental update puts the new forms in front of the saved data
+        test_TopValues : tests the counts of the ';'-separated values returned by valueCounts() and topValues()
+        test_LoadData : tests that a new instance only re-parses the response when it is newer than the saved data
+        test_ConcurrentUpdates : tests that updates from several threads leave a complete parquet file
     """
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.api = FakeJotform(FIXTURE)
+        cls.patches = [
+            patch('barrierReferralData.SESSION.get', cls.api.get),
+            patch('barrierReferralData.RESPONSE_CACHE', os.path.join(cls.tmp.name, 'response.json')),
+            patch('barrierReferralData.DATA_FILE', os.path.join(cls.tmp.name, 'barrierReferralData.parquet')),
+        ]
+        for p in cls.patches:
+            p.start()
+        cls.X = BarrierReferralData()
+
+    @classmethod
+    def tearDownClass(cls):
+        for p in cls.patches:
+            p.stop()
+        cls.tmp.cleanup()
+
     def test_Response(self):
         # success message
-        result = X.response['message']
+        result = self.X.response['message']
         self.assertEqual(result, 'success')
 
         # 200 code
-        result = X.response['message']
+        result = self.X.response['message']
         self.assertEqual(result, 'success')
 
     def test_ActiveEntires(self):
         # num of active entires
-        result = X.meta['active_entries']
-        active_entries = len([X.response['content'][i]['status'] for i in range(len(X.response['content'])) if X.response['content'][i]['status'] == 'ACTIVE'])
+        result = self.X.meta['active_entries']
+        active_entries = len([self.X.response['content'][i]['status'] for i in range(len(self.X.response['content'])) if self.X.response['content'][i]['status'] == 'ACTIVE'])
         self.assertEqual(result, active_entries)
 
     def test_Cols(self):
-        result = list(X.data.columns)
+        result = list(self.X.data.columns)
         cols = ['date', 'submission_type', 'age', 'sex', 'ethnicity', 'barrier_description', 'barrier_list', 
                      'barrier_cause', 'barrier_solution', 'solution_path', 'referring_org', 
                      'referring_staff', 'staff_email', 'staff_phone','family_contact', 'family_address', 
@@ -38,13 +95,13 @@ class TestBarrierData(unittest.TestCase):
 
     def test_UpdateData(self):
         # save orignal limit left
-        original_limit = X.meta['limit_left']
+        original_limit = self.X.meta['limit_left']
 
         # update the data
-        X.updateData()
+        self.X.updateData()
 
         # save the new updated limit
-        new_limit = X.meta['limit_left']
+        new_limit = self.X.meta['limit_left']
 
         self.assertEqual(original_limit-new_limit, 1)
 
@@ -52,11 +109,152 @@ class TestBarrierData(unittest.TestCase):
         address_one = '1106 N Aspen Ave Eastvale, CA, 92880'
         address_two = 'Cherry St 92831 Ojai, CA'
 
-        zipcode_one = X._BarrierReferralData__extractZipcode(address_one)
-        zipcode_two = X._BarrierReferralData__extractZipcode(address_two)
+        zipcode_one = self.X._BarrierReferralData__extractZipcode(address_one)
+        zipcode_two = self.X._BarrierReferralData__extractZipcode(address_two)
 
         self.assertEqual(zipcode_one, '92880')
         self.assertEqual(zipcode_two, '92831')
 
+    def test_Version(self):
+        # same data, same version
+        self.assertEqual(self.X.version, self.X._BarrierReferralData__dataVersion())
+
+        # changed data, new version
+        original_data = self.X.data
+        self.X.data = original_data.iloc[1:]
+        new_version = self.X._BarrierReferralData__dataVersion()
+        self.X.data = original_data
+
+        self.assertNotEqual(self.X.version, new_version)
+
+        # same rows in a different order, new version
+        self.X.data = original_data.iloc[::-1].reset_index(drop=True)
+        reordered_version = self.X._BarrierReferralData__dataVersion()
+        self.X.data = original_data
+
+        self.assertNotEqual(self.X.version, reordered_version)
+
+    def test_CategoricalCols(self):
+        for col in ['sex', 'ethnicity', 'zipcode', 'solution_path']:
+            self.assertEqual(self.X.barriers[col].dtype, 'category')
+
+    def test_FormatSubmissionTypeCol(self):
+        submission_types = pd.Series(['Barrier Log Only (non-referral)', 'Organization Referral', 'Self-Referral', 'Other', pd.NA])
+
+        result = self.X._BarrierReferralData__formatSubmissionTypeCol(submission_types)
+
+        self.assertEqual(list(result), ['Barrier Log', 'Organization Referral', 'Self-Referral', 'Self-Referral', 'Self-Referral'])
+        self.assertEqual(list(result.cat.categories), ['Barrier Log', 'Self-Referral', 'Organization Referral'])
+
+    def test_LatestDate(self):
+        latest_date = pd.to_datetime(self.X.latestDate, format='%m-%d-%Y')
+        self.assertEqual(latest_date, self.X.data['date'].max().normalize())
+
+    def test_Dtypes(self):
+        self.assertEqual(self.X.data['zipcode'].dtype, 'string')
+        self.assertEqual(self.X.data['age'].dtype, 'Int16')
+        for col in ['submission_type', 'sex', 'ethnicity']:
+            self.assertEqual(self.X.data[col].dtype, 'category')
+
+        # out of range ages ('40000' and '1e9' in the fixture) become NA instead of failing the cast
+        ages = self.X.data.set_index('family_contact')['age']
+        self.assertTrue(pd.isna(ages['Test Family 7']))
+        self.assertTrue(pd.isna(ages['Test Family 8']))
+        self.assertTrue(ages.dropna().between(0, 150).all())
+
+    def test_IncrementalUpdate(self):
+        self.X.updateData()
+        old = self.X.data
+
+        # no new submissions: the data is kept as is
+        self.X.updateData(incremental=True)
+        self.assertIs(self.X.data, old)
+
+        # three submissions newer than last_created (the middle one deleted, the first one
+        # with an ethnicity that is not in the saved data yet)
+        content = self.api.response['content']
+        self.addCleanup(self.api.response.__setitem__, 'content', content)
+        new = copy.deepcopy(content[:3])
+        for k, entry in enumerate(new):
+            entry['created_at'] = f'2024-03-0{3 - k} 09:00:00'
+            entry['status'] = 'DELETED' if k == 1 else 'ACTIVE'
+            answers = {answer['text']: answer for answer in entry['answers'].values()}
+            answers['Family Contact Name']['prettyFormat'] = f'New Family {k}'
+            if k == 0:
+                answers['Ethnicity']['answer'] = 'Pacific Islander'
+        self.api.response['content'] = new + content
+
+        self.X.updateData(incremental=True)
+        data = self.X.data
+
+        # new active forms first, then the saved data
+        self.assertEqual(len(data), len(old) + 2)
+        self.assertEqual(list(data['family_contact'][:2]), ['New Family 0', 'New Family 2'])
+        pd.testing.assert_frame_equal(data.iloc[2:].reset_index(drop=True), old, check_categorical=False)
+        self.assertEqual(self.X.meta['active_entries'], len(data))
+        self.assertEqual(self.X.last_created, '2024-03-03 09:00:00')
+
+        # the response still matches the data: the new forms in front of the last full response
+        self.assertEqual(self.X.response['content'], new + content)
+        self.assertEqual(self.X.meta['active_entries'], sum(entry['status'] == 'ACTIVE' for entry in self.X.response['content']))
+        self.assertEqual(self.X.meta['limit_left'], self.api.response['limit-left'])
+
+        # dtypes and categories survive the concat
+        self.assertEqual(list(data.dtypes.map(str)), list(old.dtypes.map(str)))
+        self.assertEqual(list(data['submission_type'].cat.categories), list(old['submission_type'].cat.categories))
+        self.assertTrue(set(old['ethnicity'].cat.categories) < set(data['ethnicity'].cat.categories))
+
+        # the parquet file matches the data (None and NA hash the same)
+        saved = pd.read_parquet(barrierReferralData.DATA_FILE)
+        reloaded = copy.copy(self.X)
+        reloaded.data = saved
+        self.assertEqual(reloaded._BarrierReferralData__dataVersion(), self.X.version)
+        self.assertEqual(list(saved.dtypes.map(str)), list(data.dtypes.map(str)))
+        self.assertEqual(saved.attrs['last_created'], self.X.last_created)
+
+    def test_TopValues(self):
+        values = [value for row in self.X.data['barrier_list'].dropna() for value in row.split(';')]
+        result = self.X.topValues('barrier_list', 3)
+        counts = self.X.valueCounts('barrier_list')
+
+        self.assertEqual(counts.sum(), len(values))
+        self.assertTrue(counts.is_monotonic_decreasing)
+        self.assertIs(self.X.valueCounts('barrier_list'), counts)
+
+        self.assertEqual(list(result), sorted((values.count(v) for v in set(values)), reverse=True)[:3])
+        self.assertEqual(result.sum(), sum(values.count(v) for v in result.index))
+
+    def test_LoadData(self):
+        self.X.updateData()
+        limit_left = self.api.response['limit-left']
+
+        # fresh response cache and newer parquet file: no API call and no parse
+        with patch.object(BarrierReferralData, 'updateData') as update:
+            Y = BarrierReferralData()
+        update.assert_not_called()
+        self.assertEqual(self.api.response['limit-left'], limit_left)
+        self.assertEqual(Y.version, self.X.version)
+        self.assertEqual(Y.last_created, self.X.last_created)
+        pd.testing.assert_series_equal(Y.data.dtypes, self.X.data.dtypes)
+
+        # response newer than the parquet file: parsed once
+        response_cache = barrierReferralData.RESPONSE_CACHE
+        os.utime(response_cache, (time.time() + 1, time.time() + 1))
+        with patch.object(BarrierReferralData, 'updateData', return_value=self.X.data) as update:
+            BarrierReferralData()
+        update.assert_called_once()
+
+    def test_ConcurrentUpdates(self):
+        threads = [threading.Thread(target=self.X.updateData) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        saved = pd.read_parquet(barrierReferralData.DATA_FILE)
+        self.assertEqual(len(saved), len(self.X.data))
+        pd.testing.assert_series_equal(saved.dtypes, self.X.data.dtypes)
+        self.assertFalse(os.path.exists(f'{barrierReferralData.DATA_FILE}.tmp'))
+
 if __name__ == '__main__':
     unittest.main()